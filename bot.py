@@ -1,11 +1,18 @@
 # bot.py
+import io
 import os
 import re
+import sys
 import random
+import signal
+import time
 import logging
 import asyncio
 import tempfile
 from pathlib import Path
+from collections import OrderedDict
+from functools import lru_cache
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
 from PIL import Image
@@ -21,6 +28,11 @@ import aiohttp
 import cv2
 from logic import gen_pass, eight_ball, coin_flip, roll_dice
 
+try:
+    import uvloop  # optional: faster event loop, not available on Windows
+except ImportError:
+    uvloop = None
+
 
 
 
@@ -34,14 +46,70 @@ log = logging.getLogger("COOl BOT")
 # ---------- Custom emojis ----------
 VICTORY = "<:VICTORY:1408236937424273529>"
 RUN = "<a:RUN:1408589572312535121>"
-NUM_EMOJIS = ["1️⃣","2️⃣","3️⃣","4️⃣","5️⃣","6️⃣","7️⃣","8️⃣","9️⃣","🔟"]
+NUM_EMOJIS = ("1️⃣","2️⃣","3️⃣","4️⃣","5️⃣","6️⃣","7️⃣","8️⃣","9️⃣","🔟")
+_DM_EMOJIS = ("😸","🦄","✨","🌀","🍀",VICTORY)
+_SAY_FLAIR = ("✨","🌈","🎉","🦄","🍭")
+_MASS_PING_RE = re.compile(r"@(everyone|here)")
+_DURATION_UNITS = {
+    "s": 1,      "sec": 1,      "secs": 1,      "second": 1,     "seconds": 1,
+    "m": 60,     "min": 60,     "mins": 60,     "minute": 60,    "minutes": 60,
+    "h": 3600,   "hr": 3600,    "hrs": 3600,    "hour": 3600,    "hours": 3600,
+    "d": 86400,  "day": 86400,  "days": 86400,
+    "w": 604800, "wk": 604800,  "wks": 604800,  "week": 604800,  "weeks": 604800,
+}
+_POLL_RE = re.compile(r'"\s*(.+?)\s*"\s*(.+)')
 
 # ---------- In-memory stores ----------
-warnings_store   = {}   # {(guild_id, user_id): [{'reason', 'by', 'at'}]}
-scheduled_unmutes = {}  # {(guild_id, user_id): asyncio.Task}
-scheduled_unbans  = {}  # {(guild_id, user_id): asyncio.Task}
+@dataclass(slots=True, frozen=True)
+class ModWarning:
+    reason: str
+    by: int         # moderator's user id
+    at: int         # Unix seconds; an int is far smaller than a tz-aware datetime
+
+class TimerRegistry:
+    """Pending timed actions keyed by (guild_id, user_id), at most one per key."""
+    __slots__ = ("_by_key",)
+
+    def __init__(self):
+        self._by_key: dict[tuple[int, int], asyncio.TimerHandle] = {}
+
+    def schedule(self, key: tuple[int, int], seconds: float, job, *args):
+        """Run job(*key, *args) as a background task after `seconds`, replacing any pending one."""
+        self.cancel(key)
+        self._by_key[key] = asyncio.get_running_loop().call_later(seconds, self._fire, key, job, args)
+
+    def cancel(self, key: tuple[int, int]) -> bool:
+        # Single pop; TimerHandle.cancel() is idempotent so no done/cancelled check is needed.
+        handle = self._by_key.pop(key, None)
+        if handle is None:
+            return False
+        handle.cancel()
+        return True
+
+    def cancel_all(self):
+        for handle in self._by_key.values():
+            handle.cancel()
+        self._by_key.clear()
+
+    def cancel_guild(self, guild_id: int):
+        for key in [k for k in self._by_key if k[0] == guild_id]:
+            self._by_key.pop(key).cancel()
+
+    def _fire(self, key: tuple[int, int], job, args: tuple):
+        del self._by_key[key]
+        _spawn(job(*key, *args))
+
+warnings_store   = OrderedDict()  # {(guild_id, user_id): [ModWarning]}, least recently warned first
+_MAX_WARN_KEYS   = 10_000
+scheduled_unmutes = TimerRegistry()
+scheduled_unbans  = TimerRegistry()
+_unmutes_in_flight = set()  # {(guild_id, user_id)} with a manual unmute request outstanding
+_background_tasks = set()  # strong refs so fire-and-forget tasks aren't GC'd mid-flight
 afk_users         = {}  # {user_id: reason}
 mod_log_store     = []  # list of action dicts
+_role_index       = {}  # {guild_id: ({name: Role}, {casefolded name: Role})}, rebuilt lazily
+_mod_cache        = {}  # {(guild_id, user_id): (expires_monotonic, bool)}, result of _is_mod
+_muted_role_cache = {}  # {guild_id: role_id} of the "Muted" role
 
 # ---------- Env ----------
 load_dotenv()
@@ -55,30 +123,92 @@ if not TOKEN:
 BASE_DIR   = Path(__file__).parent.resolve()
 IMAGES_DIR = Path(os.getenv("IMAGES_DIR", BASE_DIR / "images")).resolve()
 VALID_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
-_image_cache: list[Path] = []
+# Uploads wait here until vetted. Same filesystem, so the final os.replace is atomic, and
+# writes inside a subdirectory don't touch IMAGES_DIR's own mtime (no rescan mid-check).
+UPLOAD_STAGING_DIR = IMAGES_DIR / ".staging"
+_image_cache: tuple[str, ...] = ()  # full paths; plain str so discord.File can take them directly
+_image_cache_mtime = 0  # IMAGES_DIR st_mtime_ns the cache was built from
+_image_blobs: dict[str, bytes] = {}  # path -> file contents for images small enough to keep in RAM
+_blob_stamps: dict[str, tuple[int, int]] = {}  # path -> (size, st_mtime_ns) of the preloaded bytes
+_BLOB_MAX_FILE  = 2 * 1024 * 1024   # bigger files are read from disk when sent
+_BLOB_MAX_TOTAL = 64 * 1024 * 1024  # overall preload budget
+
+def _load_blobs(paths: tuple[str, ...]) -> tuple[dict[str, bytes], dict[str, tuple[int, int]]]:
+    """Preload what fits the budget. Files unchanged (size + mtime) since the last scan keep
+    their bytes, so a rescan only reads what's new."""
+    blobs, stamps, budget = {}, {}, _BLOB_MAX_TOTAL
+    for p in paths:
+        try:
+            st = os.stat(p)
+            size = st.st_size
+            if size > _BLOB_MAX_FILE or size > budget:
+                continue
+            stamp = (size, st.st_mtime_ns)
+            blob = _image_blobs.get(p) if _blob_stamps.get(p) == stamp else None
+            blobs[p] = blob if blob is not None else _read_bytes(p)
+            stamps[p] = stamp
+            budget -= size
+        except OSError as e:
+            log.warning(f"[MEME] Could not preload {p}: {e}")
+    return blobs, stamps
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _image_files(paths: list[str]) -> list[discord.File]:
+    """Attachments for paths: preloaded blobs where we have them, other files read in worker threads."""
+    async def load(p: str) -> bytes:
+        blob = _image_blobs.get(p)
+        return blob if blob is not None else await asyncio.to_thread(_read_bytes, p)
+    results = await asyncio.gather(*(load(p) for p in paths), return_exceptions=True)
+    files = []
+    for p, r in zip(paths, results):
+        if isinstance(r, Exception):
+            log.warning(f"[MEME] Could not attach {p}: {r}")
+        else:
+            files.append(discord.File(io.BytesIO(r), filename=os.path.basename(p)))
+    return files
 
 def _refresh_image_cache() -> int:
-    global _image_cache
+    """Rescan IMAGES_DIR and preload what fits in the blob budget. Blocking; run via to_thread."""
+    global _image_cache, _image_cache_mtime, _image_blobs, _blob_stamps
     if not IMAGES_DIR.exists():
         IMAGES_DIR.mkdir(parents=True, exist_ok=True)
-    _image_cache = sorted([p for p in IMAGES_DIR.iterdir() if p.suffix.lower() in VALID_EXTS])
-    log.info(f"[MEME] Loaded {len(_image_cache)} image(s) from {IMAGES_DIR}")
+    # Stat before scanning so a file dropped in mid-scan still bumps the mtime next time.
+    _image_cache_mtime = os.stat(IMAGES_DIR).st_mtime_ns
+    # Unordered on purpose: _pick_images samples at random, so sorting would be wasted work.
+    with os.scandir(IMAGES_DIR) as it:
+        paths = tuple(e.path for e in it
+                      if not e.name.startswith(".") and e.name.lower().endswith(VALID_EXTS) and e.is_file())
+    _image_blobs, _blob_stamps = _load_blobs(paths)
+    _image_cache = paths
+    log.info(f"[MEME] Loaded {len(_image_cache)} image(s) from {IMAGES_DIR} ({len(_image_blobs)} preloaded)")
     return len(_image_cache)
 
-def _pick_images(k: int = 1) -> list[Path]:
-    if not _image_cache:
+async def _get_image_cache() -> tuple[str, ...]:
+    """Current image list; rescans (off-thread) only when IMAGES_DIR's mtime has moved."""
+    try:
+        changed = os.stat(IMAGES_DIR).st_mtime_ns != _image_cache_mtime
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        await asyncio.to_thread(_refresh_image_cache)
+    return _image_cache
+
+def _pick_images(k: int = 1) -> list[str]:
+    cache = _image_cache
+    if not cache:
         return []
     k = max(1, min(k, 4))
-    if len(_image_cache) >= k:
-        return random.sample(_image_cache, k=k)
-    return [random.choice(_image_cache) for _ in range(k)]
+    # Distinct picks when there are enough images, otherwise allow repeats.
+    return random.sample(cache, k) if len(cache) >= k else random.choices(cache, k=k)
 
 async def fact_extractor()-> str:
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://uselessfacts.jsph.pl/random.json?language=en", timeout=8) as resp:
-                resp.raise_for_status()
-                return (await resp.json()).get("text", "No fact found.")
+        async with http_session.get("https://uselessfacts.jsph.pl/random.json?language=en", timeout=8) as resp:
+            resp.raise_for_status()
+            return (await resp.json()).get("text", "No fact found.")
     except Exception as e:
         log.warning(f"[FACT] fetch failed: {e}")
         return "Couldn't fetch a fact right now."
@@ -91,7 +221,38 @@ intents.voice_states = True
 
 allowed = discord.AllowedMentions(everyone=False, roles=False, users=True, replied_user=False)
 
-bot = commands.Bot(
+# One pooled session for every outbound API call (facts, duck, weather, HF) so
+# TLS handshakes and DNS lookups are reused instead of redone per command.
+http_session: aiohttp.ClientSession | None = None
+# bot.user.id, set in setup_hook: login() has filled self.user by then, and messages can
+# arrive before on_ready while guilds are still chunking.
+_self_id: int = 0
+
+class CoolBot(commands.Bot):
+    async def setup_hook(self):
+        global http_session, _self_id
+        _self_id = self.user.id
+        # Per-request timeouts still override the default below.
+        http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=8),
+            connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300, keepalive_timeout=75),
+        )
+
+    async def close(self):
+        # Timed unmutes/unbans are in-memory only, so there's nothing to persist: drop the timers
+        # and give already-running background jobs a bounded moment to unwind.
+        scheduled_unmutes.cancel_all()
+        scheduled_unbans.cancel_all()
+        pending = [t for t in _background_tasks if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=2.0)
+        await super().close()
+        if http_session is not None and not http_session.closed:
+            await http_session.close()
+
+bot = CoolBot(
     command_prefix="$",
     intents=intents,
     help_command=None,
@@ -107,6 +268,17 @@ def _can_act(invoker: discord.Member, target: discord.Member) -> bool:
 def _role_height_ok(guild: discord.Guild, role: discord.Role) -> bool:
     return guild.me.top_role > role
 
+def _role_by_name(guild: discord.Guild, name: str) -> discord.Role | None:
+    """O(1) role lookup by name: exact match first, then case-insensitive.
+    Dropped by the role events below and rebuilt on next use."""
+    idx = _role_index.get(guild.id)
+    if idx is None:
+        # reversed so the lowest role wins on duplicate names, same as discord.utils.get
+        roles = list(reversed(guild.roles))
+        idx = _role_index[guild.id] = ({r.name: r for r in roles}, {r.name.casefold(): r for r in roles})
+    exact, folded = idx
+    return exact.get(name) or folded.get(name.casefold())
+
 async def _ensure_guild(ctx: commands.Context):
     if ctx.guild is None:
         await ctx.send("This command only works in servers.")
@@ -116,6 +288,11 @@ async def _ensure_guild(ctx: commands.Context):
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
+@lru_cache(maxsize=1024)
+def _fmt_ts(ts: float, style: str) -> str:
+    """Memoised discord.utils.format_dt keyed on the POSIX timestamp."""
+    return discord.utils.format_dt(datetime.fromtimestamp(ts, tz=timezone.utc), style=style)
+
 def _log_mod_action(guild_id: int, mod_id: int, action: str, target: str, reason: str):
     mod_log_store.append({
         "action": action, "mod_id": mod_id, "target": target,
@@ -124,6 +301,13 @@ def _log_mod_action(guild_id: int, mod_id: int, action: str, target: str, reason
     if len(mod_log_store) > 500:
         mod_log_store.pop(0)
 
+def _spawn(coro) -> asyncio.Task:
+    """create_task that keeps a reference until the task finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 async def _try_delete(ctx: commands.Context):
     try:
         await ctx.message.delete()
@@ -138,33 +322,92 @@ async def _private_reply(ctx: commands.Context, content: str = None, embed: disc
     except discord.Forbidden:
         await ctx.send(content=content, embed=embed, delete_after=15, **kwargs)
 
+def _can_react(ctx: commands.Context) -> bool:
+    """Checked once before a batch of add_reaction calls that would otherwise each fail with 403.
+    Create Reaction needs Read Message History as well as Add Reactions."""
+    p = ctx.channel.permissions_for(ctx.me)
+    return p.add_reactions and p.read_message_history
+
 async def _mod_reply(ctx: commands.Context, content: str = None, embed: discord.Embed = None, **kwargs):
     """Delete command message (hides mod's command) and post result publicly."""
-    await _try_delete(ctx)
-    await ctx.send(content=content, embed=embed, **kwargs)
+    # Independent requests: overlap them instead of paying two sequential round-trips.
+    await asyncio.gather(_try_delete(ctx), ctx.send(content=content, embed=embed, **kwargs))
+
+def _preflight(ctx: commands.Context, member: discord.Member, bot_check: bool = True) -> str | None:
+    """Why the command can't touch member: "hierarchy" (invoker), "botrole" (bot), or None if it can."""
+    if not _can_act(ctx.author, member):
+        return "hierarchy"
+    # Only actions Discord gates on the bot outranking the target (kick, ban, nickname) need this.
+    # mute, and warn's auto-mute, only assign Muted (the role, not the member, must sit below us);
+    # deafen is a voice-state edit gated by Deafen Members alone, with no hierarchy rule.
+    if bot_check and ctx.guild.me.top_role <= member.top_role:
+        return "botrole"
+    return None
+
+async def _mod_guard(ctx: commands.Context, member: discord.Member, verb: str, bot_check: bool = True) -> bool:
+    """Guild + _preflight checks shared by the moderation commands. Replies and returns False if any fails."""
+    if not await _ensure_guild(ctx):
+        return False
+    problem = _preflight(ctx, member, bot_check)
+    if problem == "hierarchy":
+        await _mod_reply(ctx, f"You can't {verb} that member due to role hierarchy.")
+    elif problem == "botrole":
+        await _mod_reply(ctx, f"My role isn't high enough to {verb} that member.")
+    return problem is None
 
 def parse_duration_to_seconds(text: str) -> int:
     text = text.strip().lower().replace(" ", "")
     if not text:
         raise ValueError("empty duration")
-    pattern = r"(\d+)([smhdw])"
-    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
-    total = sum(int(a) * units[u] for a, u in re.findall(pattern, text))
+    # Single pass: digit runs, each closed by a unit ("m", "min", "minutes", ...). Anything else
+    # (unknown words, a trailing bare number) is rejected instead of silently skipped.
+    units = _DURATION_UNITS
+    total, i, end = 0, 0, len(text)
+    while i < end:
+        j = i
+        while j < end and "0" <= text[j] <= "9":
+            j += 1
+        k = j
+        while k < end and "a" <= text[k] <= "z":
+            k += 1
+        mult = units.get(text[j:k])
+        if j == i or mult is None:
+            raise ValueError("invalid duration")
+        total += int(text[i:j]) * mult
+        i = k
     if total == 0:
         raise ValueError("invalid duration")
     return total
 
+def _get_muted_role(guild: discord.Guild) -> discord.Role | None:
+    """Resolve the Muted role by cached id; falls back to the name index on a miss."""
+    rid = _muted_role_cache.get(guild.id)
+    role = guild.get_role(rid) if rid else None
+    if role is None:
+        role = _role_by_name(guild, "Muted")
+        if role:
+            _muted_role_cache[guild.id] = role.id
+    return role
+
 async def ensure_muted_role(guild: discord.Guild) -> discord.Role:
-    role = discord.utils.get(guild.roles, name="Muted")
+    role = _get_muted_role(guild)
     if role:
         return role
     role = await guild.create_role(name="Muted", reason="Auto-created for mute command")
+    _muted_role_cache[guild.id] = role.id
     overwrite = discord.PermissionOverwrite(send_messages=False, add_reactions=False, speak=False, connect=False)
-    for channel in guild.channels:
-        try:
+    # All channels share one rate-limit route; a few in flight at a time avoids a burst of 429s.
+    sem = asyncio.Semaphore(5)
+
+    async def _apply(channel: discord.abc.GuildChannel):
+        async with sem:
             await channel.set_permissions(role, overwrite=overwrite)
-        except Exception:
-            pass
+
+    # Categories are kept on purpose: synced child channels inherit their overwrite.
+    results = await asyncio.gather(*(_apply(c) for c in guild.channels), return_exceptions=True)
+    failed = sum(isinstance(r, Exception) for r in results)
+    if failed:
+        log.warning(f"[MUTE] Couldn't set Muted overwrites on {failed}/{len(results)} channel(s) in {guild.name}")
     return role
 
 def image_has_face(path: Path) -> bool:
@@ -175,59 +418,41 @@ def image_has_face(path: Path) -> bool:
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     return len(face.detectMultiScale(gray, 1.3, 5)) > 0
 
-async def schedule_unmute(guild_id: int, user_id: int, seconds: int, reason: str = "Timed mute expired"):
-    key = (guild_id, user_id)
-    old = scheduled_unmutes.get(key)
-    if old and not old.done():
-        old.cancel()
-
-    async def _task():
-        try:
-            await asyncio.sleep(seconds)
-            guild = bot.get_guild(guild_id)
-            if not guild:
-                return
-            member = guild.get_member(user_id)
-            if not member:
-                return
-            role = discord.utils.get(guild.roles, name="Muted")
-            if role and role in member.roles:
-                await member.remove_roles(role, reason=reason)
-                channel = guild.system_channel or discord.utils.get(guild.text_channels)
-                if channel:
-                    await channel.send(f"🔈 Auto-unmuted {member.mention} — mute expired. {VICTORY}")
-        except asyncio.CancelledError:
-            pass
-        finally:
-            scheduled_unmutes.pop(key, None)
-
-    scheduled_unmutes[key] = asyncio.create_task(_task())
-
-async def schedule_unban(guild_id: int, user_id: int, seconds: int):
-    key = (guild_id, user_id)
-    old = scheduled_unbans.get(key)
-    if old and not old.done():
-        old.cancel()
-
-    async def _task():
-        try:
-            await asyncio.sleep(seconds)
-            guild = bot.get_guild(guild_id)
-            if not guild:
-                return
-            try:
-                await guild.unban(discord.Object(id=user_id), reason="Temp ban expired")
-                channel = guild.system_channel or discord.utils.get(guild.text_channels)
-                if channel:
-                    await channel.send(f"🔓 Auto-unbanned user ID `{user_id}` — temp ban expired.")
-            except discord.NotFound:
-                pass
-        except asyncio.CancelledError:
-            pass
-        finally:
-            scheduled_unbans.pop(key, None)
+# Pending unmutes/unbans are plain loop timers (TimerHandle) rather than Tasks
+# parked in asyncio.sleep, so a week-long mute costs one small handle in the
+# loop's timer heap instead of a suspended coroutine frame. The real work only
+# becomes a Task when the timer fires.
+async def _do_unmute(guild_id: int, user_id: int, reason: str):
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return
+    member = guild.get_member(user_id)
+    if not member:
+        return
+    role = _get_muted_role(guild)
+    if role and member.get_role(role.id):
+        await member.remove_roles(role, reason=reason)
+        channel = guild.system_channel or discord.utils.get(guild.text_channels)
+        if channel:
+            await channel.send(f"🔈 Auto-unmuted {member.mention} — mute expired. {VICTORY}")
+
+def schedule_unmute(guild_id: int, user_id: int, seconds: int, reason: str = "Timed mute expired"):
+    scheduled_unmutes.schedule((guild_id, user_id), seconds, _do_unmute, reason)
+
+async def _do_unban(guild_id: int, user_id: int):
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return
+    try:
+        await guild.unban(discord.Object(id=user_id), reason="Temp ban expired")
+        channel = guild.system_channel or discord.utils.get(guild.text_channels)
+        if channel:
+            await channel.send(f"🔓 Auto-unbanned user ID `{user_id}` — temp ban expired.")
+    except discord.NotFound:
+        pass
 
-    scheduled_unbans[key] = asyncio.create_task(_task())
+def schedule_unban(guild_id: int, user_id: int, seconds: int):
+    scheduled_unbans.schedule((guild_id, user_id), seconds, _do_unban)
 
 # ---------- Image Moderation ----------
 BANNED_WORDS = {"Nigga", "NIGGA", "CP", "cheesepiza", "slut", "SLUT"}
@@ -246,11 +471,36 @@ def looks_like_meme(text: str) -> bool:
     t = text.strip()
     return len(t) >= 6 and " " in t
 
+_MOD_CACHE_TTL = 30.0  # seconds
+_MOD_CACHE_SWEEP_AT = 1024  # purge expired entries once the cache reaches this size
+_mod_cache_next_sweep = 0.0
+
 def _is_mod(ctx: commands.Context) -> bool:
-    perms = getattr(ctx.author, "guild_permissions", None)
-    if not perms:
+    global _mod_cache_next_sweep
+    if ctx.guild is None:
         return False
-    return perms.administrator or perms.manage_messages or perms.kick_members or perms.ban_members
+    key = (ctx.guild.id, ctx.author.id)
+    now = time.monotonic()
+    cached = _mod_cache.get(key)
+    if cached is not None:
+        if cached[0] > now:
+            return cached[1]
+        del _mod_cache[key]
+    perms = getattr(ctx.author, "guild_permissions", None)
+    is_mod = bool(perms and (perms.administrator or perms.manage_messages or perms.kick_members or perms.ban_members))
+    if len(_mod_cache) >= _MOD_CACHE_SWEEP_AT and now >= _mod_cache_next_sweep:
+        # Users who never come back would otherwise keep their expired entry forever.
+        # At most one sweep per TTL, so a cache full of live entries isn't rescanned per call.
+        for k in [k for k, (exp, _) in _mod_cache.items() if exp <= now]:
+            del _mod_cache[k]
+        _mod_cache_next_sweep = now + _MOD_CACHE_TTL
+    # Role/guild events invalidate eagerly; the TTL only backstops an event we never saw.
+    _mod_cache[key] = (now + _MOD_CACHE_TTL, is_mod)
+    return is_mod
+
+def _forget_guild_perms(guild_id: int):
+    for key in [k for k in _mod_cache if k[0] == guild_id]:
+        del _mod_cache[key]
 
 def image_dynamic_cooldown(ctx: commands.Context) -> commands.Cooldown:
     if _is_mod(ctx):
@@ -264,13 +514,11 @@ async def is_meme_image(path: Path) -> bool:
 
     headers = {"Authorization": f"Bearer {HF_TOKEN}"}
     try:
-        async with aiohttp.ClientSession() as session:
-            with open(path, "rb") as f:
-                data = f.read()
-            async with session.post(HF_API_URL, headers=headers, data=data, timeout=20) as resp:
-                if resp.status != 200:
-                    return looks_like_meme(extract_text_from_image(path))
-                result = await resp.json()
+        data = await asyncio.to_thread(_read_bytes, path)
+        async with http_session.post(HF_API_URL, headers=headers, data=data, timeout=20) as resp:
+            if resp.status != 200:
+                return looks_like_meme(extract_text_from_image(path))
+            result = await resp.json()
 
         if not isinstance(result, list) or not result:
             return looks_like_meme(extract_text_from_image(path))
@@ -294,10 +542,9 @@ async def is_meme_image(path: Path) -> bool:
 # ---------- Duck fetcher ----------
 async def get_duck_image_url() -> str:
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://random-d.uk/api/random", timeout=8) as resp:
-                resp.raise_for_status()
-                return (await resp.json()).get("url", "")
+        async with http_session.get("https://random-d.uk/api/random", timeout=8) as resp:
+            resp.raise_for_status()
+            return (await resp.json()).get("url", "")
     except Exception as e:
         log.warning(f"[DUCK] fetch failed: {e}")
         return ""
@@ -319,13 +566,74 @@ def _tts_to_file(text: str, filepath: str) -> None:
 @bot.event
 async def on_ready():
     log.info(f"✅ Logged in as {bot.user} (id: {bot.user.id})")
-    count = _refresh_image_cache()
+    count = await asyncio.to_thread(_refresh_image_cache)
     log.info(f"📸 Meme cache: {count} file(s) in {IMAGES_DIR}")
+    # Warm the Muted lookup once so mute/unmute never have to scan roles; role events keep it current.
+    for guild in bot.guilds:
+        _get_muted_role(guild)
     await bot.change_presence(activity=discord.Game(name="$help | now with voice 🔊"))
 
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    _get_muted_role(guild)
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    # Kicked or guild deleted: nothing keyed by it can be used again.
+    gid = guild.id
+    scheduled_unmutes.cancel_guild(gid)
+    scheduled_unbans.cancel_guild(gid)
+    for key in [k for k in warnings_store if k[0] == gid]:
+        del warnings_store[key]
+    _role_index.pop(gid, None)
+    _muted_role_cache.pop(gid, None)
+    _forget_guild_perms(gid)
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    _role_index.pop(role.guild.id, None)
+    if role.name.casefold() == "muted":
+        _muted_role_cache.setdefault(role.guild.id, role.id)
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    _role_index.pop(after.guild.id, None)
+    if before.permissions != after.permissions:
+        _forget_guild_perms(after.guild.id)
+    if before.name != after.name:
+        _muted_role_cache.pop(after.guild.id, None)
+        _get_muted_role(after.guild)
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    _role_index.pop(role.guild.id, None)
+    _forget_guild_perms(role.guild.id)
+    if _muted_role_cache.get(role.guild.id) == role.id:
+        del _muted_role_cache[role.guild.id]
+        _get_muted_role(role.guild)
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        _mod_cache.pop((after.guild.id, after.id), None)
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    _mod_cache.pop((member.guild.id, member.id), None)
+
+@bot.event
+async def on_guild_update(before: discord.Guild, after: discord.Guild):
+    if before.owner_id != after.owner_id:
+        _forget_guild_perms(after.id)
+
+_DM_FIRST_WORD_RE = re.compile(r"\s*(\w+)")
+_DM_GREETINGS = frozenset({"hi", "hello", "hola"})
+_ECHO_FMT = "You whispered: **%s** %s"
+_dm_cooldown = commands.CooldownMapping.from_cooldown(3, 5, commands.BucketType.user)  # DM auto-replies
+
 @bot.event
 async def on_message(message: discord.Message):
-    if message.author == bot.user:
+    if message.author.id == _self_id:
         return
 
     # AFK: clear status when the AFK user speaks
@@ -351,102 +659,115 @@ async def on_message(message: discord.Message):
 
     # DM handling
     if isinstance(message.channel, discord.DMChannel):
-        text = message.content.strip().lower()
-        if text.startswith(("hi", "hello", "hola")):
+        # Commands get no auto-reply; anything else can't be a command, so skip process_commands
+        if message.content.startswith("$"):
+            return await bot.process_commands(message)
+        if _dm_cooldown.get_bucket(message).update_rate_limit():
+            return  # spamming: drop the auto-reply
+        m = _DM_FIRST_WORD_RE.match(message.content)
+        if m and m[1].lower() in _DM_GREETINGS:
             await message.channel.send(f"👋 ¡Hola! Try `$help` for commands. {VICTORY}")
-        elif text.startswith("$pass"):
-            await message.channel.send(gen_pass(10) + f" {VICTORY}")
         else:
-            await message.channel.send(
-                f"You whispered: **{message.content}** {random.choice(['😸','🦄','✨','🌀','🍀',VICTORY])}"
-            )
-        await bot.process_commands(message)
+            await message.channel.send(_ECHO_FMT % (message.content, random.choice(_DM_EMOJIS)))
         return
 
     await bot.process_commands(message)
 
 # ---------- Help ----------
+_HELP_LINES = [
+    "**Commands (prefix: `$`)**",
+    "• `hello` / `bye` → greetings",
+    "• `pass [len]` → strong password *(DM'd)*",
+    "• `8ball [q]` → cosmic wisdom 🎱",
+    "• `flip` → coin flip | `roll [NdM]` → dice",
+    "• `say <text>` → I repeat (pings disabled)",
+    "• `ping` → latency",
+    "• `avatar [@user]` → profile pic *(DM'd)*",
+    "• `userinfo [@user]` → user info *(DM'd)*",
+    "• `serverinfo` → server stats",
+    "• `roleinfo <role>` → role details",
+    "• `choose a | b | ...` → I pick one",
+    "• `poll \"Q\" a | b | ...` → reaction poll",
+    "• `remindme <time> <msg>` → DM reminder",
+    "• `dadjoke` → groan 😅",
+    "• `afk [reason]` → set AFK status",
+    "• `color #hex` → preview a color",
+    "• `weather <city>` → current weather + 3-day forecast 🌤️",
+    "• `DUCK` 🦆 | `MEME [n]` | `memevs` | `uploadimage`",
+    "• `randomfact` → get a random fact from the internet",
+    "",
+]
+_HELP_MOD_LINES = [
+    "",
+    "__Mod / Admin__",
+    "• `kick @u [r]` / `ban @u [r]` / `unban <id> [r]`",
+    "• `softban @u [r]` → ban+unban (clears msgs)",
+    "• `tempban @u <dur> [r]` → timed ban",
+    "• `purge <n>` (1–100)",
+    "• `warn @u [r]` / `warnings @u` / `clearwarnings @u`",
+    "• `mute @u [dur]` / `unmute @u`",
+    "• `deafen @u` / `undeafen @u`",
+    "• `movevc @u <channel>` → move to VC",
+    "• `slowmode <s>` / `lockdown [r]` / `unlock`",
+    "• `nickname @u <name>` / `giverole` / `removerole`",
+    "• `modlog [n]` → recent mod actions",
+    "• `joined <member>`",
+    "**🔊 Voice** *(mod only — prevents spam)*",
+    "• `join` → join your VC",
+    "• `leave` → leave VC",
+    "• `speak <text>` → TTS via pyttsx3",
+    "• `speakweather <city>` → read weather aloud (`$sw`)",
+    "• `speakrandomfact` → read a random fact aloud",
+    "⚡ *Auto-mute triggers at 3 warnings (10 min)*",
+]
+# Versions can't change while the process runs, so both variants are built once.
+_PY_VER = "{0.major}.{0.minor}.{0.micro}".format(sys.version_info)
+_BUILD_TAG = f"\nPython {_PY_VER} • discord.py {discord.__version__}"
+HELP_USER  = "\n".join(_HELP_LINES + [_BUILD_TAG])
+HELP_ADMIN = "\n".join(_HELP_LINES + _HELP_MOD_LINES + [_BUILD_TAG])
+# Never mutated after import, so the same Embed objects are safe to send every time.
+_HELP_EMBED_USER  = discord.Embed(title="📖 Bot Super Cool Help", description=HELP_USER,  color=0x5865F2)
+_HELP_EMBED_ADMIN = discord.Embed(title="📖 Bot Super Cool Help", description=HELP_ADMIN, color=0x5865F2)
+
 @bot.command(name="help")
 async def _help(ctx: commands.Context):
-    is_mod = False
-    if isinstance(ctx.channel, discord.TextChannel):
-        p = ctx.author.guild_permissions
-        is_mod = p.administrator or p.manage_messages or p.kick_members or p.ban_members
-
-    lines = [
-        "**Commands (prefix: `$`)**",
-        "• `hello` / `bye` → greetings",
-        "• `pass [len]` → strong password *(DM'd)*",
-        "• `8ball [q]` → cosmic wisdom 🎱",
-        "• `flip` → coin flip | `roll [NdM]` → dice",
-        "• `say <text>` → I repeat (pings disabled)",
-        "• `ping` → latency",
-        "• `avatar [@user]` → profile pic *(DM'd)*",
-        "• `userinfo [@user]` → user info *(DM'd)*",
-        "• `serverinfo` → server stats",
-        "• `roleinfo <role>` → role details",
-        "• `choose a | b | ...` → I pick one",
-        "• `poll \"Q\" a | b | ...` → reaction poll",
-        "• `remindme <time> <msg>` → DM reminder",
-        "• `dadjoke` → groan 😅",
-        "• `afk [reason]` → set AFK status",
-        "• `color #hex` → preview a color",
-        "• `weather <city>` → current weather + 3-day forecast 🌤️",
-        "• `DUCK` 🦆 | `MEME [n]` | `memevs` | `uploadimage`",
-        "• `randomfact` → get a random fact from the internet",
-        "",
-       
-       
-    ]
-    if is_mod:
-        lines += [
-            "",
-            "__Mod / Admin__",
-            "• `kick @u [r]` / `ban @u [r]` / `unban <id> [r]`",
-            "• `softban @u [r]` → ban+unban (clears msgs)",
-            "• `tempban @u <dur> [r]` → timed ban",
-            "• `purge <n>` (1–100)",
-            "• `warn @u [r]` / `warnings @u` / `clearwarnings @u`",
-            "• `mute @u [dur]` / `unmute @u`",
-            "• `deafen @u` / `undeafen @u`",
-            "• `movevc @u <channel>` → move to VC",
-            "• `slowmode <s>` / `lockdown [r]` / `unlock`",
-            "• `nickname @u <name>` / `giverole` / `removerole`",
-            "• `modlog [n]` → recent mod actions",
-            "• `joined <member>`",
-            "**🔊 Voice** *(mod only — prevents spam)*",
-            "• `join` → join your VC",
-            "• `leave` → leave VC",
-            "• `speak <text>` → TTS via pyttsx3",
-            "• `speakweather <city>` → read weather aloud (`$sw`)",
-            "• `speakrandomfact` → read a random fact aloud",
-            "⚡ *Auto-mute triggers at 3 warnings (10 min)*",
-        ]
-    lines.append(f"\nPython {os.sys.version.split()[0]} • discord.py {discord.__version__}")
-
-    embed = discord.Embed(title="📖 Bot Super Cool Help", description="\n".join(lines), color=0x5865F2)
-    await _private_reply(ctx, embed=embed)
+    await _private_reply(ctx, embed=_HELP_EMBED_ADMIN if _is_mod(ctx) else _HELP_EMBED_USER)
 
 # ---------- Fun ----------
+# Fixed replies, formatted once at import
+_HELLO_MSG  = f"HELLOHS SIRMENS {VICTORY}"
+_INSULT_MSG = f"No u {VICTORY} {RUN}"
+_KIDNAP_MSG = f"HAHAHA NUB {RUN} {RUN}"
+_BYE_MSG    = f"Ok fine, dramatic exit in 3…2…1… {RUN} {VICTORY} {VICTORY} {VICTORY}"
+_DAD_JOKES  = (
+    "I would tell you a construction joke, but I'm still working on it.",
+    "Why did the scarecrow get promoted? He was outstanding in his field.",
+    "I used to hate facial hair… but then it grew on me.",
+    "Why don't eggs tell jokes? They'd crack each other up.",
+    "I'm reading a book about anti-gravity. It's impossible to put down.",
+    "Why can't you give Elsa a balloon? Because she'll let it go.",
+    "I asked my dog what 2 minus 2 is. He said nothing.",
+)
+
 @bot.command(name="hello")
 async def hello(ctx: commands.Context):
     await _try_delete(ctx)
-    await ctx.send(f"HELLOHS SIRMENS {VICTORY}")
+    await ctx.send(_HELLO_MSG)
 
 @bot.command(name="FUCKYOU")
 async def insult(ctx: commands.Context):
     await _try_delete(ctx)
-    await ctx.send(f"No u {VICTORY} {RUN}")
+    await ctx.send(_INSULT_MSG)
 
 @bot.command(name="THEYTOOKMYFAMILY")
 async def kidnapping(ctx: commands.Context):
     await _try_delete(ctx)
-    await ctx.send(f"HAHAHA NUB {RUN} {RUN}")
+    await ctx.send(_KIDNAP_MSG)
 
 @bot.command(name="bye")
 async def bye(ctx: commands.Context):
     await _try_delete(ctx)
-    await ctx.send(f"Ok fine, dramatic exit in 3…2…1… {RUN} {VICTORY} {VICTORY} {VICTORY}")
+    await ctx.send(_BYE_MSG)
 
 @bot.command(name="pass")
 @commands.cooldown(2, 5, commands.BucketType.user)
@@ -479,9 +800,8 @@ async def roll(ctx: commands.Context, dice: str = "1d6"):
 @commands.cooldown(2, 10, commands.BucketType.user)
 async def say(ctx: commands.Context, *, text: str):
     await _try_delete(ctx)
-    text = text.replace("@everyone", "@\u200beveryone").replace("@here", "@\u200bhere")
-    flair = random.choice(["✨", "🌈", "🎉", "🦄", "🍭"])
-    await ctx.send(f"{text} {flair}", allowed_mentions=discord.AllowedMentions.none())
+    text = _MASS_PING_RE.sub("@\u200b\\1", text)
+    await ctx.send(f"{text} {random.choice(_SAY_FLAIR)}", allowed_mentions=discord.AllowedMentions.none())
 
 @bot.command(name="ping")
 async def ping(ctx: commands.Context):
@@ -491,16 +811,7 @@ async def ping(ctx: commands.Context):
 @bot.command(name="dadjoke")
 async def dadjoke(ctx: commands.Context):
     await _try_delete(ctx)
-    jokes = [
-        "I would tell you a construction joke, but I'm still working on it.",
-        "Why did the scarecrow get promoted? He was outstanding in his field.",
-        "I used to hate facial hair… but then it grew on me.",
-        "Why don't eggs tell jokes? They'd crack each other up.",
-        "I'm reading a book about anti-gravity. It's impossible to put down.",
-        "Why can't you give Elsa a balloon? Because she'll let it go.",
-        "I asked my dog what 2 minus 2 is. He said nothing.",
-    ]
-    await ctx.send(random.choice(jokes) + f" {VICTORY}")
+    await ctx.send(random.choice(_DAD_JOKES) + f" {VICTORY}")
 
 @bot.command(name="afk")
 async def afk(ctx: commands.Context, *, reason: str = "AFK"):
@@ -575,7 +886,7 @@ async def roleinfo(ctx: commands.Context, *, role_name: str):
     if not await _ensure_guild(ctx):
         return
     await _try_delete(ctx)
-    role = discord.utils.get(ctx.guild.roles, name=role_name)
+    role = _role_by_name(ctx.guild, role_name)
     if not role:
         return await ctx.send(f"Role `{role_name}` not found.", delete_after=8)
     embed = discord.Embed(title=f"Role: {role.name}", color=role.color)
@@ -598,22 +909,21 @@ async def choose(ctx: commands.Context, *, options: str):
 @bot.command(name="poll")
 async def poll(ctx: commands.Context, *, text: str):
     await _try_delete(ctx)
-    m = re.match(r'"\s*(.+?)\s*"\s*(.+)', text)
+    m = _POLL_RE.match(text)
     if not m:
         return await ctx.send('Format: `$poll "Question" opt1 | opt2 | opt3`', delete_after=8)
     question, options = m.groups()
-    opts = [o.strip() for o in options.split("|") if o.strip()]
+    opts = list(filter(None, (o.strip() for o in options.split("|"))))
     if not (2 <= len(opts) <= 10):
         return await ctx.send("Need 2–10 options separated by `|`.", delete_after=8)
-    desc = "\n".join(f"{NUM_EMOJIS[i]}  {opt}" for i, opt in enumerate(opts))
+    desc = "\n".join(f"{emoji}  {opt}" for emoji, opt in zip(NUM_EMOJIS, opts))
     embed = discord.Embed(title=f"📊 {question}", description=desc, color=0x7289DA)
     embed.set_footer(text=f"Poll by {ctx.author}")
     msg = await ctx.send(embed=embed)
-    for i in range(len(opts)):
-        try:
-            await msg.add_reaction(NUM_EMOJIS[i])
-        except Exception:
-            pass
+    if not _can_react(ctx):
+        return
+    # Fire all reactions at once; any that still fail are just ignored as before
+    await asyncio.gather(*(msg.add_reaction(emoji) for emoji in NUM_EMOJIS[:len(opts)]), return_exceptions=True)
 
 @bot.command(name="remindme")
 async def remindme(ctx: commands.Context, time: str, *, message: str):
@@ -640,15 +950,10 @@ async def remindme(ctx: commands.Context, time: str, *, message: str):
 @commands.dynamic_cooldown(image_dynamic_cooldown, commands.BucketType.user)
 async def meme(ctx: commands.Context, count: int = 1):
     await _try_delete(ctx)
-    if not _image_cache:
+    if not await _get_image_cache():
         return await ctx.send(f"No images in `{IMAGES_DIR}`.", delete_after=8)
     count = max(1, min(int(count), 4))
-    files = []
-    for p in _pick_images(count):
-        try:
-            files.append(discord.File(fp=str(p), filename=p.name))
-        except Exception as e:
-            log.warning(f"[MEME] Could not attach {p}: {e}")
+    files = await _image_files(_pick_images(count))
     if not files:
         return await ctx.send("Couldn't attach any image files.")
     await ctx.send(content=f"Here you go {ctx.author.mention}! {VICTORY}", files=files)
@@ -657,22 +962,15 @@ async def meme(ctx: commands.Context, count: int = 1):
 @commands.dynamic_cooldown(image_dynamic_cooldown, commands.BucketType.user)
 async def memevs(ctx: commands.Context):
     await _try_delete(ctx)
-    if not _image_cache:
+    if not await _get_image_cache():
         return await ctx.send(f"No images in `{IMAGES_DIR}`.", delete_after=8)
-    files = []
-    for p in _pick_images(2):
-        try:
-            files.append(discord.File(fp=str(p), filename=p.name))
-        except Exception as e:
-            log.warning(f"[MEME] Could not attach {p}: {e}")
+    files = await _image_files(_pick_images(2))
     if not files:
         return await ctx.send("Couldn't attach images.")
     msg = await ctx.send(content=f"**Meme Battle!** Vote: 1️⃣ or 2️⃣ {VICTORY}", files=files)
-    try:
-        await msg.add_reaction("1️⃣")
-        await msg.add_reaction("2️⃣")
-    except Exception:
-        pass
+    if not _can_react(ctx):
+        return
+    await asyncio.gather(msg.add_reaction("1️⃣"), msg.add_reaction("2️⃣"), return_exceptions=True)
 
 @bot.command(name="DUCK", aliases=["duck"])
 @commands.dynamic_cooldown(image_dynamic_cooldown, commands.BucketType.user)
@@ -909,11 +1207,10 @@ def _weather_emoji(desc: str) -> str:
 async def _fetch_weather(city: str) -> dict | None:
     url = f"https://wttr.in/{city}?format=j1"
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10, headers={"Accept": "application/json"}) as resp:
-                if resp.status != 200:
-                    return None
-                return await resp.json(content_type=None)
+        async with http_session.get(url, timeout=10, headers={"Accept": "application/json"}) as resp:
+            if resp.status != 200:
+                return None
+            return await resp.json(content_type=None)
     except Exception as e:
         log.warning(f"[WEATHER] fetch failed: {e}")
         return None
@@ -985,15 +1282,15 @@ async def weather(ctx: commands.Context, *, city: str):
         await ctx.send(f"❌ Unexpected data format for **{city}**.", delete_after=10)
 
 # ---------- Moderation ----------
+_NOT_MUTED_MSG = "That member is not muted."
+_FORBIDDEN_UNMUTE_MSG = "I don't have permission to remove the Muted role."
+_UNMUTED_FMT   = f"🔈 Unmuted {{mention}}. {VICTORY}"  # only the mention is filled per call
+
 @bot.command(name="kick")
 @commands.has_permissions(kick_members=True)
 async def kick(ctx: commands.Context, member: discord.Member, *, reason: str = "No reason provided"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "kick"):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't act on that member due to role hierarchy.")
-    if ctx.guild.me.top_role <= member.top_role:
-        return await _mod_reply(ctx, "My role isn't high enough to kick that member.")
     try:
         await member.kick(reason=reason)
         _log_mod_action(ctx.guild.id, ctx.author.id, "KICK", str(member), reason)
@@ -1006,12 +1303,8 @@ async def kick(ctx: commands.Context, member: discord.Member, *, reason: str = "
 @bot.command(name="ban")
 @commands.has_permissions(ban_members=True)
 async def ban(ctx: commands.Context, member: discord.Member, *, reason: str = "No reason provided"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "ban"):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't act on that member due to role hierarchy.")
-    if ctx.guild.me.top_role <= member.top_role:
-        return await _mod_reply(ctx, "My role isn't high enough to ban that member.")
     try:
         await member.ban(reason=reason)
         _log_mod_action(ctx.guild.id, ctx.author.id, "BAN", str(member), reason)
@@ -1040,10 +1333,8 @@ async def unban(ctx: commands.Context, user_id: int, *, reason: str = "No reason
 @commands.has_permissions(ban_members=True)
 async def softban(ctx: commands.Context, member: discord.Member, *, reason: str = "Softban"):
     """Ban then immediately unban — purges recent messages."""
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "softban"):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't act on that member due to role hierarchy.")
     try:
         await member.ban(reason=f"[SOFTBAN] {reason}", delete_message_days=1)
         await ctx.guild.unban(member, reason="Softban unban")
@@ -1057,10 +1348,8 @@ async def softban(ctx: commands.Context, member: discord.Member, *, reason: str
 @bot.command(name="tempban")
 @commands.has_permissions(ban_members=True)
 async def tempban(ctx: commands.Context, member: discord.Member, duration: str, *, reason: str = "Temp ban"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "tempban"):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't act on that member due to role hierarchy.")
     try:
         seconds = parse_duration_to_seconds(duration)
     except ValueError:
@@ -1068,7 +1357,7 @@ async def tempban(ctx: commands.Context, member: discord.Member, duration: str,
     try:
         await member.ban(reason=f"[TEMPBAN {duration}] {reason}")
         _log_mod_action(ctx.guild.id, ctx.author.id, f"TEMPBAN({duration})", str(member), reason)
-        await schedule_unban(ctx.guild.id, member.id, seconds)
+        schedule_unban(ctx.guild.id, member.id, seconds)
         await _mod_reply(ctx, f"⏳🔨 Temp banned **{member}** for **{duration}** — {reason}")
     except discord.Forbidden:
         await _mod_reply(ctx, "I don't have permission to ban.")
@@ -1083,16 +1372,23 @@ async def purge(ctx: commands.Context, count: int):
         return
     if not (1 <= count <= 100):
         return await ctx.send("Choose a number between 1 and 100.", delete_after=5)
-    await _try_delete(ctx)
-    deleted = await ctx.channel.purge(limit=count)
-    await ctx.send(f"🧹 Deleted **{len(deleted)}** messages.", delete_after=3)
+    if count < 100:
+        # The invoking message is the newest one, so it rides along in the same bulk delete
+        # (+1) instead of costing its own DELETE request.
+        deleted = await ctx.channel.purge(limit=count + 1)
+    else:
+        # 101 would split into two bulk requests (100 max each); delete the command message
+        # on its own, overlapped with the purge instead.
+        _, deleted = await asyncio.gather(_try_delete(ctx), ctx.channel.purge(limit=count, before=ctx.message))
+    n = sum(1 for m in deleted if m.id != ctx.message.id)
+    await ctx.send(f"🧹 Deleted **{n}** messages.", delete_after=3)
 
 @bot.command(name="giverole")
 @commands.has_permissions(manage_roles=True)
 async def giverole(ctx: commands.Context, member: discord.Member, *, role_name: str):
     if not await _ensure_guild(ctx):
         return
-    role = discord.utils.get(ctx.guild.roles, name=role_name)
+    role = _role_by_name(ctx.guild, role_name)
     if role is None:
         return await _mod_reply(ctx, f"Role `{role_name}` not found.")
     if not _role_height_ok(ctx.guild, role):
@@ -1111,7 +1407,7 @@ async def giverole(ctx: commands.Context, member: discord.Member, *, role_name:
 async def removerole(ctx: commands.Context, member: discord.Member, *, role_name: str):
     if not await _ensure_guild(ctx):
         return
-    role = discord.utils.get(ctx.guild.roles, name=role_name)
+    role = _role_by_name(ctx.guild, role_name)
     if role is None:
         return await _mod_reply(ctx, f"Role `{role_name}` not found.")
     if not _role_height_ok(ctx.guild, role):
@@ -1132,28 +1428,30 @@ async def joined(ctx: commands.Context, *, member: discord.Member):
         return
     await _try_delete(ctx)
     joined_at = member.joined_at
-    joined_abs = discord.utils.format_dt(joined_at, style="F") if joined_at else "Unknown"
-    joined_rel = discord.utils.format_dt(joined_at, style="R") if joined_at else ""
-    roles = [r for r in member.roles if r != ctx.guild.default_role]
-    if roles:
-        top   = member.top_role if member.top_role != ctx.guild.default_role else None
-        other = sorted([r for r in roles if r != top], key=lambda x: x.position, reverse=True)
-        role_line = ", ".join(([top.mention] if top else []) + [r.mention for r in other])
-    else:
-        role_line = "No roles"
+    joined_abs = _fmt_ts(joined_at.timestamp(), "F") if joined_at else "Unknown"
+    joined_rel = _fmt_ts(joined_at.timestamp(), "R") if joined_at else ""
+    # member.roles is already in hierarchy order, so reversed() lists top_role first
+    everyone  = ctx.guild.default_role
+    mentions  = [r.mention for r in reversed(member.roles) if r is not everyone]
+    role_line = ", ".join(mentions) or "No roles"
     await ctx.send(f"**{member}** joined {joined_abs} ({joined_rel})\n**Roles:** {role_line}")
 
 # ---- Warnings ----
 @bot.command(name="warn")
 @commands.has_permissions(manage_messages=True)
 async def warn(ctx: commands.Context, member: discord.Member, *, reason: str = "No reason provided"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "warn", bot_check=False):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't warn that member due to role hierarchy.")
     key = (ctx.guild.id, member.id)
-    warnings_store.setdefault(key, []).append({"reason": reason, "by": ctx.author.id, "at": _now_utc()})
-    count = len(warnings_store[key])
+    warns = warnings_store.get(key)
+    if warns is None:
+        warns = warnings_store[key] = []
+        if len(warnings_store) > _MAX_WARN_KEYS:
+            warnings_store.popitem(last=False)
+    else:
+        warnings_store.move_to_end(key)
+    warns.append(ModWarning(reason=reason, by=ctx.author.id, at=int(time.time())))
+    count = len(warns)
     try:
         await member.send(f"⚠️ You've been warned in **{ctx.guild.name}**: {reason}")
     except discord.Forbidden:
@@ -1164,10 +1462,10 @@ async def warn(ctx: commands.Context, member: discord.Member, *, reason: str = "
     # Auto-escalation: 3+ warnings → auto-mute 10 min
     if count >= 3:
         role = await ensure_muted_role(ctx.guild)
-        if role not in member.roles:
+        if not member.get_role(role.id):
             try:
                 await member.add_roles(role, reason="Auto-mute: 3+ warnings")
-                await schedule_unmute(ctx.guild.id, member.id, 600)
+                schedule_unmute(ctx.guild.id, member.id, 600)
                 await ctx.channel.send(
                     f"🔇 {member.mention} auto-muted for **10 minutes** after reaching **{count} warnings**.",
                     delete_after=15,
@@ -1187,9 +1485,9 @@ async def warnings_cmd(ctx: commands.Context, member: discord.Member):
         return await ctx.send(f"{member.mention} has no warnings. {VICTORY}", delete_after=8)
     lines = [f"Warnings for **{member}** ({len(entries)} total):"]
     for i, w in enumerate(entries, 1):
-        when = discord.utils.format_dt(w["at"], style="R")
-        mod  = ctx.guild.get_member(w["by"])
-        lines.append(f"{i}. {w['reason']} — by {mod.mention if mod else w['by']} ({when})")
+        when = _fmt_ts(w.at, "R")
+        mod  = ctx.guild.get_member(w.by)
+        lines.append(f"{i}. {w.reason} — by {mod.mention if mod else w.by} ({when})")
     await ctx.send("\n".join(lines))
 
 @bot.command(name="clearwarnings")
@@ -1248,10 +1546,8 @@ async def unlock(ctx: commands.Context):
 @bot.command(name="nickname")
 @commands.has_permissions(manage_nicknames=True)
 async def nickname(ctx: commands.Context, member: discord.Member, *, new_name: str):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "rename"):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't change that member's nickname due to role hierarchy.")
     try:
         await member.edit(nick=new_name, reason=f"By {ctx.author}")
         _log_mod_action(ctx.guild.id, ctx.author.id, "NICKNAME", str(member), new_name)
@@ -1262,12 +1558,17 @@ async def nickname(ctx: commands.Context, member: discord.Member, *, new_name: s
 @bot.command(name="mute")
 @commands.has_permissions(moderate_members=True, manage_roles=True)
 async def mute(ctx: commands.Context, member: discord.Member, duration: str = None, *, reason: str = "Muted"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "mute", bot_check=False):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't mute that member due to role hierarchy.")
+    # Parse before touching roles: a bad duration must not leave an open-ended mute behind.
+    seconds = None
+    if duration:
+        try:
+            seconds = parse_duration_to_seconds(duration)
+        except ValueError:
+            return await _mod_reply(ctx, "Duration format invalid. Use like `10m`, `2h30m`, `3d`.")
     role = await ensure_muted_role(ctx.guild)
-    if role in member.roles:
+    if member.get_role(role.id):
         return await _mod_reply(ctx, "They're already muted.")
     try:
         await member.add_roles(role, reason=f"{reason} — by {ctx.author}")
@@ -1276,37 +1577,37 @@ async def mute(ctx: commands.Context, member: discord.Member, duration: str = No
         await _mod_reply(ctx, f"🔇 Muted {member.mention}{dur_text} — {reason}")
     except discord.Forbidden:
         return await _mod_reply(ctx, "I don't have permission to add the Muted role.")
-    if duration:
-        try:
-            await schedule_unmute(ctx.guild.id, member.id, parse_duration_to_seconds(duration))
-        except ValueError:
-            await ctx.send("Duration format invalid. Use like `10m`, `2h30m`, `3d`.", delete_after=8)
+    if seconds:
+        schedule_unmute(ctx.guild.id, member.id, seconds)
 
 @bot.command(name="unmute")
 @commands.has_permissions(moderate_members=True, manage_roles=True)
 async def unmute(ctx: commands.Context, member: discord.Member):
     if not await _ensure_guild(ctx):
         return
-    role = discord.utils.get(ctx.guild.roles, name="Muted")
-    if not role or role not in member.roles:
-        return await _mod_reply(ctx, "That member is not muted.")
+    key = (ctx.guild.id, member.id)
+    # Repeated $unmute while the first is still in flight would just send duplicate requests.
+    if key in _unmutes_in_flight:
+        return await _mod_reply(ctx, "Already unmuting that member.")
+    role = _get_muted_role(ctx.guild)
+    if not role or not member.get_role(role.id):
+        return await _mod_reply(ctx, _NOT_MUTED_MSG)
+    _unmutes_in_flight.add(key)
     try:
         await member.remove_roles(role, reason=f"Unmuted by {ctx.author}")
-        task = scheduled_unmutes.pop((ctx.guild.id, member.id), None)
-        if task and not task.done():
-            task.cancel()
+        scheduled_unmutes.cancel(key)
         _log_mod_action(ctx.guild.id, ctx.author.id, "UNMUTE", str(member), "Manual unmute")
-        await _mod_reply(ctx, f"🔈 Unmuted {member.mention}. {VICTORY}")
+        await _mod_reply(ctx, _UNMUTED_FMT.format(mention=member.mention))
     except discord.Forbidden:
-        await _mod_reply(ctx, "I don't have permission to remove the Muted role.")
+        await _mod_reply(ctx, _FORBIDDEN_UNMUTE_MSG)
+    finally:
+        _unmutes_in_flight.discard(key)
 
 @bot.command(name="deafen")
 @commands.has_permissions(deafen_members=True)
 async def deafen(ctx: commands.Context, member: discord.Member, *, reason: str = "Deafened"):
-    if not await _ensure_guild(ctx):
+    if not await _mod_guard(ctx, member, "deafen", bot_check=False):
         return
-    if not _can_act(ctx.author, member):
-        return await _mod_reply(ctx, "You can't deafen that member due to role hierarchy.")
     if member.voice is None:
         return await _mod_reply(ctx, f"{member.mention} is not in a voice channel.")
     try:
@@ -1384,8 +1685,9 @@ async def upload_image(ctx: commands.Context):
             continue
 
         unique = f"{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{name}"
-        path   = IMAGES_DIR / unique
+        path   = UPLOAD_STAGING_DIR / unique
         try:
+            UPLOAD_STAGING_DIR.mkdir(parents=True, exist_ok=True)
             await attachment.save(path)
         except Exception as e:
             log.warning(f"[UPLOAD] Save failed {name}: {e}")
@@ -1403,10 +1705,18 @@ async def upload_image(ctx: commands.Context):
             rejected.append(name + " (not meme-like)")
             continue
 
+        # Only now does the file become visible to the meme cache.
+        try:
+            os.replace(path, IMAGES_DIR / unique)
+        except OSError as e:
+            log.warning(f"[UPLOAD] Move into {IMAGES_DIR} failed {name}: {e}")
+            path.unlink(missing_ok=True)
+            rejected.append(name + " (save error)")
+            continue
         accepted.append(unique)
 
     if accepted:
-        _refresh_image_cache()
+        await asyncio.to_thread(_refresh_image_cache)
 
     msg = []
     if accepted:
@@ -1416,26 +1726,83 @@ async def upload_image(ctx: commands.Context):
     await ctx.send("\n".join(msg), delete_after=10)
 
 # ---------- Error Handler ----------
+_MISSING_PERMS_MSG     = "🛡️ You're missing permissions for that."
+_BOT_MISSING_PERMS_MSG = "⚠️ I'm missing permissions. Adjust my role or channel perms."
+_MEMBER_NOT_FOUND_MSG  = "❓ Can't find that member. Try mentioning them or use an exact name."
+_UNEXPECTED_FMT        = "Unexpected error: `{}`"
+_unhandled_counts: dict[type, int] = {}  # occurrences per underlying exception type
+
+async def _safe_send(ctx: commands.Context, content: str, **kwargs):
+    """ctx.send for error replies: if the reply itself fails (channel gone, no perms) just drop it
+    rather than raising a second error out of on_command_error."""
+    try:
+        await ctx.send(content, **kwargs)
+    except discord.HTTPException:
+        pass
+
+async def _err_cooldown(ctx: commands.Context, error: commands.CommandOnCooldown):
+    await _safe_send(ctx, f"⏳ Slow down! Try again in **{error.retry_after:.1f}s**.", delete_after=5)
+
+async def _err_missing_perms(ctx: commands.Context, error: commands.MissingPermissions):
+    await _safe_send(ctx, _MISSING_PERMS_MSG, delete_after=8)
+
+async def _err_bot_missing_perms(ctx: commands.Context, error: commands.BotMissingPermissions):
+    await _safe_send(ctx, _BOT_MISSING_PERMS_MSG, delete_after=8)
+
+async def _err_not_found(ctx: commands.Context, error: BadArgument):
+    await _safe_send(ctx, _MEMBER_NOT_FOUND_MSG, delete_after=8)
+
+async def _err_missing_arg(ctx: commands.Context, error: commands.MissingRequiredArgument):
+    await _safe_send(ctx, f"❌ Missing: `{error.param.name}`. Try `$help`.", delete_after=8)
+
+# Looked up along type(error).__mro__, so subclasses (every BadArgument flavour) still match.
+_ERROR_HANDLERS = {
+    commands.CommandOnCooldown:       _err_cooldown,
+    commands.MissingPermissions:      _err_missing_perms,
+    commands.BotMissingPermissions:   _err_bot_missing_perms,
+    commands.MemberNotFound:          _err_not_found,
+    BadArgument:                      _err_not_found,
+    commands.MissingRequiredArgument: _err_missing_arg,
+}
+
 @bot.event
 async def on_command_error(ctx: commands.Context, error):
-    if hasattr(ctx.command, "on_error"):
+    cmd = ctx.command
+    # No command: an unknown "$word" (CommandNotFound). Not worth a reply or a traceback.
+    if cmd is None or cmd.has_error_handler():
         return
-    if isinstance(error, commands.CommandOnCooldown):
-        return await ctx.send(f"⏳ Slow down! Try again in **{error.retry_after:.1f}s**.", delete_after=5)
-    if isinstance(error, commands.MissingPermissions):
-        return await ctx.send("🛡️ You're missing permissions for that.", delete_after=8)
-    if isinstance(error, commands.BotMissingPermissions):
-        return await ctx.send("⚠️ I'm missing permissions. Adjust my role or channel perms.", delete_after=8)
-    if isinstance(error, (commands.MemberNotFound, BadArgument)):
-        return await ctx.send("❓ Can't find that member. Try mentioning them or use an exact name.", delete_after=8)
-    if isinstance(error, commands.MissingRequiredArgument):
-        return await ctx.send(f"❌ Missing: `{error.param.name}`. Try `$help`.", delete_after=8)
-
-    log.exception("Unhandled command error", exc_info=error)
-    await ctx.send(f"Unexpected error: `{error}`", delete_after=10)
+    etype = type(error)
+    for cls in etype.__mro__:
+        handler = _ERROR_HANDLERS.get(cls)
+        if handler:
+            return await handler(ctx, error)
+
+    # A command that breaks on every call shouldn't flood the log: print the traceback for the
+    # 1st, 2nd, 4th, 8th... occurrence of each underlying exception type only.
+    otype = type(getattr(error, "original", error))  # unwrap CommandInvokeError
+    n = _unhandled_counts[otype] = _unhandled_counts.get(otype, 0) + 1
+    if n & (n - 1) == 0:
+        log.exception(f"Unhandled command error (seen {n}x)", exc_info=error)
+    await _safe_send(ctx, _UNEXPECTED_FMT.format(error), delete_after=10)
 
 # ---------- Run ----------
 if TOKEN == "REPLACE_ME_WITH_ENV_VAR":
     raise SystemExit("Set DISCORD_TOKEN env var instead of hardcoding your token.")
 
-bot.run(TOKEN)
+async def main():
+    # docker stop / systemd send SIGTERM: unwind through the same close() path as Ctrl+C.
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:  # no loop signal handlers on Windows
+        pass
+    try:
+        async with bot:
+            await bot.start(TOKEN)
+    except asyncio.CancelledError:
+        pass
+
+try:
+    # uvloop.run instead of an event loop policy: policies are deprecated from Python 3.14.
+    (uvloop.run if uvloop is not None else asyncio.run)(main())
+except KeyboardInterrupt:
+    pass